@@ -3,17 +3,375 @@ Algolia Handler using Gemini Function Calling
 Registers Algolia search as a tool that Gemini can automatically invoke
 """
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-from algoliasearch.search.client import SearchClient
-from algoliasearch.search.models import SearchParamsObject
-from google import genai
-from google.genai import types
-import chainlit as cl
-from dotenv import load_dotenv
+import time
+from functools import lru_cache
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable, TYPE_CHECKING
+from datetime import date
+
+# Heavy dependencies (algoliasearch, google.genai, chainlit, and asyncio, which is
+# costly to import on its own) are imported where they are used so that importing
+# this module stays cheap for batch jobs/tests
+if TYPE_CHECKING:
+    import asyncio
+    from algoliasearch.search.client import SearchClient
+    from google import genai
+    from google.genai import types
+
+
+def load_env(dotenv_path: Optional[str] = None) -> bool:
+    """
+    Load variables from a .env file into os.environ
+    Call this once at process startup; importing the module does not do it
+
+    Args:
+        dotenv_path: Optional path to the .env file (defaults to dotenv's search)
+
+    Returns:
+        True if at least one variable was loaded
+    """
+    from dotenv import load_dotenv
+    return load_dotenv(dotenv_path)
+
+
+# Connection pool defaults shared by the Algolia (aiohttp) and Gemini (httpx) clients
+DEFAULT_POOL_OPTIONS = {
+    "max_connections": 20,          # Per client, across all hosts
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 60.0,       # Seconds an idle connection is kept open
+    "dns_cache_ttl": 300,           # Seconds resolved Algolia hosts are cached
+    "connect_timeout": 2.0,         # Seconds
+    "read_timeout": 5.0             # Seconds (Algolia client default)
+}
+
+# Per-turn deadline: each stage may use this share of the time still remaining
+DEFAULT_TURN_TIMEOUT = 60.0         # Seconds
+DEFAULT_STAGE_SHARES = {
+    "model": 0.4,                   # First Gemini call (decides on tool calls)
+    "tools": 0.5,                   # Algolia searches / statistics
+    "synthesis": 1.0                # Final Gemini call gets whatever is left
+}
+
+# Incremental events published during a turn (see AlgoliaGeminiTool.add_listener)
+EVENTS = (
+    "turn_started",      # {"query"}
+    "sources",           # {"function", "sources", "total", "timed_out"} - as soon as a tool returns
+    "answer",            # {"text", "timed_out"}
+    "turn_completed"     # {"success", "timed_out", "cancelled", "function_calls", "sources"} - always the last event
+)
+
+# Algolia DSN hosts serve searches; hedged attempts go to the fallback hosts
+ALGOLIA_HEDGE_HOSTS = ["{}-1.algolianet.com", "{}-2.algolianet.com", "{}-3.algolianet.com"]
+
+
+# Attributes the search tool formats; only these are retrieved on the fast path
+SEARCH_ATTRIBUTES = [
+    "title", "description", "issuer", "location", "site", "siteUrl",
+    "created", "closingDate", "publishDate", "questionsDueByDate",
+    "cnStatus", "cnType", "categories", "keywords"
+]
+
+# Hit fields holding millisecond timestamps
+TIMESTAMP_FIELDS = ["created", "closingDate", "publishDate", "questionsDueByDate"]
+
+# Near-duplicate collapsing: the same RFP is often scraped from several sites.
+# Searches over-fetch by this factor (capped) so enough unique hits remain.
+DEDUPE_OVERFETCH_FACTOR = 3
+DEDUPE_MAX_FETCH = 150
+DEDUPE_MAX_DISTANCE = 3             # Max differing title SimHash bits for two hits to match
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Title words that identify one solicitation among similar ones ("25-001", "Building B");
+# two titles must agree on all of them to match
+_IDENTIFIER_PATTERN = re.compile(r"[0-9]|^[a-z]$")
+
+# _SPREAD[b] places bit i of byte b in its own 8-bit lane (bit 8*i), so summing
+# spread hashes counts each of the 64 bit positions in parallel
+_SPREAD = [sum(1 << (8 * i) for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+# orjson is an optional speed-up (pip install orjson); resolved once on first use
+_orjson = None
+
+
+def _get_orjson():
+    """The orjson module, or None when it is not installed"""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+            _orjson = orjson
+        except ImportError:
+            _orjson = False
+    return _orjson or None
+
+
+def _json_loads(data):
+    """Decode JSON with orjson when it is installed"""
+    orjson = _get_orjson()
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+def _json_dumps(obj, indent: bool = False) -> str:
+    """Encode JSON with orjson when it is installed"""
+    orjson = _get_orjson()
+    if orjson is None:
+        return json.dumps(obj, indent=2 if indent else None)
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+
+
+def _timestamp_value(value) -> Optional[float]:
+    """The value if it can be a millisecond timestamp, else None (malformed records hold lists, dicts, strings)"""
+    return value if isinstance(value, (int, float)) else None
+
+
+def _format_timestamps(timestamps) -> Dict[Any, Optional[str]]:
+    """Convert millisecond timestamps to YYYY-MM-DD in one pass, each distinct value once"""
+    formatted = {}
+    for timestamp in {_timestamp_value(timestamp) for timestamp in timestamps}:
+        if not timestamp:
+            formatted[timestamp] = None
+            continue
+        try:
+            formatted[timestamp] = date.fromtimestamp(timestamp / 1000).isoformat()
+        except (TypeError, ValueError, OverflowError, OSError):
+            formatted[timestamp] = None
+    return formatted
+
+
+@lru_cache(maxsize=4096)
+def _token_hash(token: str) -> int:
+    """Stable 64-bit hash of a word, identical across processes (unlike hash())"""
+    import hashlib
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
+
+def _simhash(features) -> int:
+    """64-bit SimHash of a collection of distinct words"""
+    features = list(features)[:255]
+    if not features:
+        return 0
+
+    counts = 0
+    for feature in features:
+        h = _token_hash(feature)
+        for k in range(8):
+            counts += _SPREAD[(h >> (8 * k)) & 0xFF] << (64 * k)
+
+    half = len(features) / 2
+    return sum(1 << i for i in range(64) if (counts >> (8 * i)) & 0xFF > half)
+
+
+def _create_algolia_client(app_id: str, api_key: str, pool_options: Dict[str, Any],
+                           hosts: Optional[List[str]] = None) -> "SearchClient":
+    """
+    Build an Algolia SearchClient whose aiohttp session uses a tuned keep-alive connector
+
+    Args:
+        hosts: Optional host templates ("{}" is replaced by the app id) to use
+               instead of Algolia's default host list
+    """
+    from aiohttp import ClientSession, TCPConnector
+    from algoliasearch.http.hosts import Host, HostsCollection
+    from algoliasearch.http.transporter import Transporter
+    from algoliasearch.search.client import SearchClient
+    from algoliasearch.search.config import SearchConfig
+
+    class PooledTransporter(Transporter):
+        """Transporter that opens its session with pooling/keep-alive settings"""
+
+        async def request(self, *args, **kwargs):
+            # The default transporter creates a session with DNS caching disabled
+            if self._session is None:
+                self._session = ClientSession(
+                    connector=TCPConnector(
+                        limit=pool_options["max_connections"],
+                        keepalive_timeout=pool_options["keepalive_expiry"],
+                        use_dns_cache=True,
+                        ttl_dns_cache=pool_options["dns_cache_ttl"]
+                    ),
+                    trust_env=True
+                )
+            return await super().request(*args, **kwargs)
+
+    config = SearchConfig(app_id, api_key)
+    config.connect_timeout = int(pool_options["connect_timeout"] * 1000)
+    config.read_timeout = int(pool_options["read_timeout"] * 1000)
+    if hosts:
+        config.hosts = HostsCollection([Host(host.format(app_id)) for host in hosts], reorder_hosts=True)
+    config.set_default_hosts()
+
+    return SearchClient.create_with_config(config=config, transporter=PooledTransporter(config))
+
+
+def _create_gemini_client(api_key: str, pool_options: Dict[str, Any]) -> "genai.Client":
+    """Build a Gemini client on top of an httpx connection pool owned by this module"""
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_options["max_connections"],
+            max_keepalive_connections=pool_options["max_keepalive_connections"],
+            keepalive_expiry=pool_options["keepalive_expiry"]
+        ),
+        timeout=httpx.Timeout(None, connect=pool_options["connect_timeout"])
+    )
+
+    return genai.Client(
+        api_key=api_key,
+        vertexai=False,
+        http_options=types.HttpOptions(httpx_async_client=http_client)
+    )
+
+
+async def _close_gemini_client(client: "genai.Client"):
+    """Close a Gemini client and the httpx pool it was built on"""
+    http_client = client._api_client._http_options.httpx_async_client
+    try:
+        await client.aio.aclose()
+    finally:
+        if http_client is not None:
+            await http_client.aclose()
+
 
-load_dotenv()
+class _TurnDeadline:
+    """Time budget for one user turn, split across the model, tool and synthesis stages"""
+
+    def __init__(self, total: float, stage_shares: Dict[str, float]):
+        self.total = total
+        self.stage_shares = stage_shares
+        self.expires_at = time.monotonic() + total
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage_timeout(self, stage: str) -> float:
+        """Seconds the given stage may use, as a share of the remaining budget"""
+        return self.remaining() * self.stage_shares.get(stage, 1.0)
+
+
+class _LatencyTracker:
+    """Rolling window of request latencies used to pick the hedging delay"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _running_loop() -> Optional["asyncio.AbstractEventLoop"]:
+    """Event loop of the calling coroutine, or None outside of one"""
+    import asyncio
+
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class _ClientRegistry:
+    """
+    Process-level registry of pooled network clients
+    Tools created with the same credentials and pool options share one Algolia and
+    one Gemini client per event loop, so TLS handshakes and DNS lookups are paid once
+    instead of per tool. aiohttp/httpx pools only work on the loop that created them,
+    so each loop (e.g. every asyncio.run() of a batch job) gets its own clients.
+    Those clients must be closed with shutdown_clients() before their loop ends:
+    once the loop is closed they can only be forgotten, and their sessions and
+    sockets stay open until garbage collection.
+    """
+
+    def __init__(self):
+        self.clients: Dict[tuple, Any] = {}
+        self.warmed_up: set = set()
+        self.latency_trackers: Dict[str, _LatencyTracker] = {}
+
+    def _get_client(self, key: tuple, factory: Callable) -> Any:
+        loop = _running_loop()
+        self._prune_closed_loops()
+        key = (loop,) + key
+        if key not in self.clients:
+            self.clients[key] = factory()
+        return self.clients[key]
+
+    def _prune_closed_loops(self):
+        """Forget clients and warm-up state of event loops that have been closed"""
+        # Closing needs the loop that owns the connections, so clients left open
+        # when their loop ended (no shutdown_clients()) leak until garbage collection
+        for key in [key for key in self.clients if key[0] is not None and key[0].is_closed()]:
+            del self.clients[key]
+        self.warmed_up = {key for key in self.warmed_up if key[0] is None or not key[0].is_closed()}
+
+    def get_algolia_client(self, app_id: str, api_key: str, pool_options: Dict[str, Any]) -> "SearchClient":
+        return self._get_client(
+            ("algolia", app_id, api_key, _pool_key(pool_options)),
+            lambda: _create_algolia_client(app_id, api_key, pool_options)
+        )
+
+    def get_algolia_hedge_client(self, app_id: str, api_key: str, pool_options: Dict[str, Any]) -> "SearchClient":
+        return self._get_client(
+            ("algolia_hedge", app_id, api_key, _pool_key(pool_options)),
+            lambda: _create_algolia_client(app_id, api_key, pool_options, hosts=ALGOLIA_HEDGE_HOSTS)
+        )
+
+    def get_gemini_client(self, api_key: str, pool_options: Dict[str, Any]) -> "genai.Client":
+        return self._get_client(
+            ("gemini", api_key, _pool_key(pool_options)),
+            lambda: _create_gemini_client(api_key, pool_options)
+        )
+
+    def get_latency_tracker(self, app_id: str) -> _LatencyTracker:
+        if app_id not in self.latency_trackers:
+            self.latency_trackers[app_id] = _LatencyTracker()
+        return self.latency_trackers[app_id]
+
+    async def shutdown(self):
+        """Close every pooled client of the running loop; later tool calls will create fresh ones"""
+        loop = _running_loop()
+        self._prune_closed_loops()
+        keys = [key for key in self.clients if key[0] is loop or key[0] is None]
+        self.warmed_up = {key for key in self.warmed_up if key[0] is not loop}
+
+        for key in keys:
+            client = self.clients.pop(key)
+            try:
+                if key[1] == "gemini":
+                    await _close_gemini_client(client)
+                else:
+                    await client.close()
+            except Exception as e:
+                print(f"Failed to close {key[1]} client: {e}")
+
+
+def _pool_key(pool_options: Dict[str, Any]) -> tuple:
+    """Hashable form of pool options, so differently tuned tools don't share a pool"""
+    return tuple(sorted(pool_options.items()))
+
+
+_client_registry = _ClientRegistry()
+
+
+async def shutdown_clients():
+    """
+    Gracefully close all shared Algolia and Gemini clients of the running event loop
+    Call this from the application's shutdown hook, and at the end of every
+    asyncio.run() that used a tool: skipping it leaks that loop's sessions and sockets
+    """
+    await _client_registry.shutdown()
 
 
 class AlgoliaGeminiTool:
@@ -39,14 +397,50 @@ class AlgoliaGeminiTool:
         if not self.gemini_api_key:
             raise ValueError("Missing Gemini API key")
 
-        # Initialize Algolia client
-        self.algolia_client = SearchClient(self.app_id, self.api_key)
-
-        # Initialize Gemini client
-        self.gemini_client = genai.Client(
-            api_key=self.gemini_api_key,
-            vertexai=False
-        )
+        # Connection pooling: tools with the same credentials share pooled clients
+        # unless share_clients is disabled, in which case close() tears them down
+        self.share_clients = config.get("share_clients", True)
+        self.pool_options = {**DEFAULT_POOL_OPTIONS, **config.get("pool_options", {})}
+        self.warmup = config.get("warmup", False)
+
+        # Per-turn deadline (seconds) and how it is split across stages
+        self.turn_timeout = config.get("turn_timeout", DEFAULT_TURN_TIMEOUT)
+        self.stage_shares = {**DEFAULT_STAGE_SHARES, **config.get("stage_shares", {})}
+
+        # Decode search responses straight from the raw JSON body instead of the
+        # client's pydantic models (set raw_json=False to use the models)
+        self.raw_json = config.get("raw_json", True)
+
+        # Duplicate RFPs across scraped sources: use Algolia's distinct when the index
+        # has attributeForDistinct configured, otherwise collapse locally (same issuer
+        # and closing date, title SimHash). Distinct mode drops the other copies
+        # server-side, so it returns no alternateSources
+        self.algolia_distinct = config.get("algolia_distinct", os.getenv("ALGOLIA_DISTINCT", "").lower() in ("1", "true"))
+        self.dedupe_results = config.get("dedupe_results", True)
+        self.dedupe_max_distance = config.get("dedupe_max_distance", DEDUPE_MAX_DISTANCE)
+
+        # Hedged Algolia searches: after the p95 latency (or hedge_delay until enough
+        # samples exist) a second attempt is sent to a fallback host
+        self.hedge_requests = config.get("hedge_requests", False)
+        self.hedge_delay = config.get("hedge_delay", 0.3)
+        self.hedge_percentile = config.get("hedge_percentile", 0.95)
+
+        # Network clients are created lazily on first use
+        self._algolia_client = None
+        self._algolia_hedge_client = None
+        self._gemini_client = None
+        self._clients_loop = None
+
+        # In-flight turn per thread_id, so a stopped/disconnected session can cancel it
+        self._active_turns: Dict[str, "asyncio.Task"] = {}
+
+        # Push sources to the Chainlit message as soon as a search returns,
+        # instead of after the answer has been synthesized
+        self.early_sources = config.get("early_sources", False)
+
+        # Subscribers to incremental turn events, by event name
+        self._listeners: Dict[str, List[Callable]] = {event: [] for event in EVENTS}
+        self._listener_tasks: set = set()
 
         # Store chat sessions per thread_id for conversation persistence
         self.chat_sessions = {}
@@ -56,6 +450,91 @@ class AlgoliaGeminiTool:
 
         print(f"Initialized AlgoliaGeminiTool: index={self.index_name}, model={self.model_name}")
 
+    def _check_clients_loop(self):
+        """Drop cached clients created on another event loop (e.g. a finished asyncio.run())"""
+        loop = _running_loop()
+        if loop is not self._clients_loop:
+            self._algolia_client = None
+            self._algolia_hedge_client = None
+            self._gemini_client = None
+            self._clients_loop = loop
+
+    @property
+    def algolia_client(self) -> "SearchClient":
+        """Algolia search client, created on first access"""
+        self._check_clients_loop()
+        if self._algolia_client is None:
+            if self.share_clients:
+                self._algolia_client = _client_registry.get_algolia_client(self.app_id, self.api_key, self.pool_options)
+            else:
+                self._algolia_client = _create_algolia_client(self.app_id, self.api_key, self.pool_options)
+        return self._algolia_client
+
+    @property
+    def algolia_hedge_client(self) -> "SearchClient":
+        """Algolia client pinned to the fallback hosts, used for hedged searches"""
+        self._check_clients_loop()
+        if self._algolia_hedge_client is None:
+            if self.share_clients:
+                self._algolia_hedge_client = _client_registry.get_algolia_hedge_client(
+                    self.app_id, self.api_key, self.pool_options
+                )
+            else:
+                self._algolia_hedge_client = _create_algolia_client(
+                    self.app_id, self.api_key, self.pool_options, hosts=ALGOLIA_HEDGE_HOSTS
+                )
+        return self._algolia_hedge_client
+
+    @property
+    def gemini_client(self) -> "genai.Client":
+        """Gemini client, created on first access"""
+        self._check_clients_loop()
+        if self._gemini_client is None:
+            if self.share_clients:
+                self._gemini_client = _client_registry.get_gemini_client(self.gemini_api_key, self.pool_options)
+            else:
+                self._gemini_client = _create_gemini_client(self.gemini_api_key, self.pool_options)
+        return self._gemini_client
+
+    async def start(self, warmup: Optional[bool] = None) -> "AlgoliaGeminiTool":
+        """
+        Prepare the tool for use, optionally warming up connections
+
+        Args:
+            warmup: Send warm-up requests to Algolia and Gemini so the first user
+                    turn doesn't pay for DNS/TLS. Defaults to config["warmup"].
+        """
+        if warmup is None:
+            warmup = self.warmup
+        if warmup:
+            await self._warmup()
+        return self
+
+    async def _warmup(self):
+        """Open pooled connections with cheap requests (once per set of shared clients)"""
+        warmup_key = (_running_loop(), self.app_id, self.gemini_api_key, _pool_key(self.pool_options))
+        if self.share_clients and warmup_key in _client_registry.warmed_up:
+            return
+
+        # Schema discovery is a tiny search, and its result is needed anyway
+        self.schema_info = None
+        await self._discover_schema()
+
+        try:
+            await self.gemini_client.aio.models.get(model=self.model_name)
+        except Exception as e:
+            print(f"Gemini warm-up failed: {e}")
+
+        if self.share_clients:
+            _client_registry.warmed_up.add(warmup_key)
+        print(f"Warmed up connections for index={self.index_name}, model={self.model_name}")
+
+    async def __aenter__(self) -> "AlgoliaGeminiTool":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
     async def _discover_schema(self) -> Dict[str, Any]:
         """
         Discover schema by sampling documents from Algolia
@@ -64,6 +543,8 @@ class AlgoliaGeminiTool:
         if self.schema_info:
             return self.schema_info
 
+        from algoliasearch.search.models import SearchParamsObject
+
         try:
             # Sample a few documents to discover schema
             search_params = SearchParamsObject(
@@ -189,60 +670,49 @@ class AlgoliaGeminiTool:
             elif filters:
                 combined_filters = filters
 
-            # Build search parameters
-            search_params = SearchParamsObject(
-                query=query,
-                hits_per_page=hits_per_page,
-                attributes_to_retrieve=["*"]
-            )
+            # Collapse duplicates server-side, or over-fetch to collapse them locally
+            dedupe_locally = self.dedupe_results and not self.algolia_distinct
+            fetch_count = hits_per_page
+            if dedupe_locally:
+                fetch_count = max(hits_per_page, min(hits_per_page * DEDUPE_OVERFETCH_FACTOR, DEDUPE_MAX_FETCH))
+
+            # Build search parameters as a plain dict, no request model needed
+            search_params = {
+                "query": query,
+                "hitsPerPage": fetch_count,
+                "attributesToRetrieve": SEARCH_ATTRIBUTES
+            }
+            if self.dedupe_results and self.algolia_distinct:
+                search_params["distinct"] = True
 
             # Add combined filters if any
             if combined_filters:
-                search_params.filters = combined_filters
+                search_params["filters"] = combined_filters
 
             # Execute search
-            results = await self.algolia_client.search_single_index(
-                index_name=self.index_name,
-                search_params=search_params
-            )
+            if self.raw_json:
+                response = await self._search_single_index(search_params, raw=True)
+                results = _json_loads(response.raw_data)
+                hits = results.get("hits", [])
+                total_hits = results.get("nbHits", len(hits))
+            else:
+                results = await self._search_single_index(search_params)
+                hits = [hit.model_dump() if hasattr(hit, 'model_dump') else hit for hit in (results.hits or [])]
+                total_hits = results.nb_hits if results.nb_hits is not None else len(hits)
 
-            # Extract and format hits
-            hits = results.hits if hasattr(results, 'hits') else []
-            total_hits = results.nb_hits if hasattr(results, 'nb_hits') else len(hits)
-            formatted_results = []
-
-            for hit in hits:
-                if hasattr(hit, 'model_dump'):
-                    hit_dict = hit.model_dump()
-                else:
-                    hit_dict = hit
-
-                # Format each result
-                result = {
-                    "title": hit_dict.get("title", "Untitled"),
-                    "description": hit_dict.get("description", ""),
-                    "issuer": hit_dict.get("issuer", ""),
-                    "location": hit_dict.get("location", ""),
-                    "site": hit_dict.get("site", ""),
-                    "siteUrl": hit_dict.get("siteUrl", ""),
-                    "scrapedDate": self._format_timestamp(hit_dict.get("created")),
-                    "closingDate": self._format_timestamp(hit_dict.get("closingDate")),
-                    "publishDate": self._format_timestamp(hit_dict.get("publishDate")),
-                    "questionsDueByDate": self._format_timestamp(hit_dict.get("questionsDueByDate")),
-                    "cnStatus": hit_dict.get("cnStatus", ""),
-                    "cnType": hit_dict.get("cnType", ""),
-                    "categories": hit_dict.get("categories", []),
-                    "keywords": hit_dict.get("keywords", [])
-                }
-                formatted_results.append(result)
+            formatted_results = self._format_hits(hits)
+            duplicates_collapsed = 0
+            if dedupe_locally:
+                formatted_results, duplicates_collapsed = self._collapse_duplicates(formatted_results, hits, hits_per_page)
 
             # Return as JSON string for Gemini with total count
-            return json.dumps({
+            return _json_dumps({
                 "success": True,
                 "total_matching_rfps": total_hits,
                 "returned_results": len(formatted_results),
+                "duplicates_collapsed": duplicates_collapsed,
                 "results": formatted_results
-            }, indent=2)
+            }, indent=True)
 
         except Exception as e:
             return json.dumps({
@@ -250,14 +720,141 @@ class AlgoliaGeminiTool:
                 "error": str(e)
             })
 
-    def _format_timestamp(self, timestamp) -> Optional[str]:
-        """Convert timestamp to readable date"""
-        if not timestamp:
-            return None
+    async def _search_single_index(self, search_params, raw: bool = False) -> Any:
+        """
+        Run an Algolia search, hedging it when enabled
+        With hedging, if the primary request hasn't answered after the tracked p95
+        latency, the same search is sent to a fallback host and the first answer wins
+
+        Args:
+            search_params: SearchParamsObject or dict of search parameters
+            raw: Return the raw ApiResponse (JSON body in .raw_data) instead of a SearchResponse
+        """
+        import asyncio
+
+        tracker = _client_registry.get_latency_tracker(self.app_id)
+        started = time.monotonic()
+
+        def search(client):
+            method = client.search_single_index_with_http_info if raw else client.search_single_index
+            return asyncio.ensure_future(method(
+                index_name=self.index_name,
+                search_params=search_params
+            ))
+
+        primary = search(self.algolia_client)
+        if not self.hedge_requests:
+            results = await primary
+            tracker.record(time.monotonic() - started)
+            return results
+
+        hedge_delay = tracker.percentile(self.hedge_percentile) or self.hedge_delay
+        pending = {primary}
         try:
-            return datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d')
-        except:
-            return None
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                print(f"Algolia search slower than {hedge_delay:.3f}s, sending hedged request")
+                pending.add(search(self.algolia_hedge_client))
+
+            # Return the first successful answer; fail only if every attempt failed
+            error = None
+            while done or pending:
+                for task in done:
+                    if task.exception() is None:
+                        tracker.record(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _collapse_duplicates(self, results: List[Dict[str, Any]], hits: List[Dict[str, Any]], limit: int) -> tuple:
+        """
+        Collapse near-duplicate RFPs scraped from different sources
+        The highest ranked copy is kept; the others' URLs are listed in its
+        alternateSources. Two hits match when issuer and closing date are equal,
+        their titles carry the same identifiers (numbers, single letters) and the
+        title SimHash fingerprints are close, so wording and punctuation differences
+        between sites still match but "Building A" and "Building B" do not.
+        Hits without a title, issuer or closing date are never collapsed.
+
+        Args:
+            results: Formatted results in ranking order
+            hits: Raw hits the results were formatted from (formatting fills in "Untitled")
+            limit: Number of unique results to return
+
+        Returns:
+            (unique results, number of duplicates collapsed)
+        """
+        unique = []
+        # (issuer, closing date) -> [(title fingerprint, title identifiers, kept result)]
+        candidates: Dict[tuple, List[tuple]] = {}
+        collapsed = 0
+
+        for result, hit in zip(results, hits):
+            key = (
+                " ".join(_TOKEN_PATTERN.findall((result.get("issuer") or "").lower())),
+                result.get("closingDate")
+            )
+            title = hit.get("title")
+            words = set(_TOKEN_PATTERN.findall(title.lower())) if isinstance(title, str) else set()
+            identifiers = frozenset(word for word in words if _IDENTIFIER_PATTERN.search(word))
+            fingerprint = _simhash(sorted(words))
+
+            # Hits without a title (fingerprint 0), issuer or closing date are never
+            # treated as duplicates: blank fields would otherwise match each other
+            match = None
+            if fingerprint and all(key):
+                for kept_fingerprint, kept_identifiers, kept in candidates.get(key, ()):
+                    if (identifiers == kept_identifiers
+                            and bin(fingerprint ^ kept_fingerprint).count("1") <= self.dedupe_max_distance):
+                        match = kept
+                        break
+
+            if match is None:
+                if len(unique) < limit:
+                    result["alternateSources"] = []
+                    unique.append(result)
+                    candidates.setdefault(key, []).append((fingerprint, identifiers, result))
+                continue
+
+            collapsed += 1
+            known_urls = {match.get("siteUrl")} | {alt["siteUrl"] for alt in match["alternateSources"]}
+            if result.get("siteUrl") and result["siteUrl"] not in known_urls:
+                match["alternateSources"].append({"site": result.get("site", ""), "siteUrl": result["siteUrl"]})
+
+        return unique, collapsed
+
+    def _format_hits(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Format plain hit dicts into tool results, converting all timestamps in one batch"""
+        # Non-numeric timestamps become None here, so one malformed record can't break the page
+        timestamps = [[_timestamp_value(hit.get(field)) for field in TIMESTAMP_FIELDS] for hit in hits]
+        dates = _format_timestamps(value for row in timestamps for value in row)
+
+        formatted_results = []
+        for hit, (created, closing_date, publish_date, questions_due) in zip(hits, timestamps):
+            get = hit.get
+            formatted_results.append({
+                "title": get("title", "Untitled"),
+                "description": get("description", ""),
+                "issuer": get("issuer", ""),
+                "location": get("location", ""),
+                "site": get("site", ""),
+                "siteUrl": get("siteUrl", ""),
+                "scrapedDate": dates[created],
+                "closingDate": dates[closing_date],
+                "publishDate": dates[publish_date],
+                "questionsDueByDate": dates[questions_due],
+                "cnStatus": get("cnStatus", ""),
+                "cnType": get("cnType", ""),
+                "categories": get("categories", []),
+                "keywords": get("keywords", [])
+            })
+        return formatted_results
 
     async def _get_statistics_tool(self, facet_by: str, filters: str = "", date_range: str = "") -> str:
         """
@@ -272,6 +869,8 @@ class AlgoliaGeminiTool:
         Returns:
             JSON string with statistical breakdown
         """
+        from algoliasearch.search.models import SearchParamsObject
+
         try:
             # Parse date range into filter if provided
             date_filter = self._parse_date_range(date_range) if date_range else ""
@@ -334,11 +933,13 @@ class AlgoliaGeminiTool:
                 "error": str(e)
             })
 
-    async def _create_search_tool_declaration(self) -> types.Tool:
+    async def _create_search_tool_declaration(self) -> "types.Tool":
         """
         Create the Gemini function declaration for Algolia search
         This tells Gemini how to call our search function with correct schema
         """
+        from google.genai import types
+
         # Discover schema first
         schema = await self._discover_schema()
         date_fields = schema.get("date_fields", ["publishDate", "closingDate"])
@@ -358,14 +959,19 @@ class AlgoliaGeminiTool:
             f"IMPORTANT: All dates must be Unix timestamps in milliseconds (not seconds)."
         )
 
+        search_description = (
+            "Search the RFP (Request for Proposal) and solicitations database. "
+            "Use this tool to find government contracts, RFPs, bids, and procurement opportunities. "
+            "You can search by keywords, filter by date ranges, locations, or categories. "
+            "The database contains information about IT services, managed services, consulting, and other government contracts."
+        )
+        # Only local collapsing reports the other copies; Algolia's distinct drops them
+        if self.dedupe_results and not self.algolia_distinct:
+            search_description += " The same RFP scraped from several sites is returned once, with the other URLs in alternateSources."
+
         search_function = types.FunctionDeclaration(
             name="search_rfp_database",
-            description=(
-                "Search the RFP (Request for Proposal) and solicitations database. "
-                "Use this tool to find government contracts, RFPs, bids, and procurement opportunities. "
-                "You can search by keywords, filter by date ranges, locations, or categories. "
-                "The database contains information about IT services, managed services, consulting, and other government contracts."
-            ),
+            description=search_description,
             parameters=types.Schema(
                 type=types.Type.OBJECT,
                 properties={
@@ -436,8 +1042,16 @@ class AlgoliaGeminiTool:
 
         return types.Tool(function_declarations=[search_function, statistics_function])
 
-    async def _get_or_create_chat_session(self, thread_id: str = None):
-        """Get existing chat session or create a new one for the thread"""
+    async def _get_or_create_chat_session(self, thread_id: str = None, history: Optional[list] = None):
+        """
+        Get existing chat session or create a new one for the thread
+
+        Args:
+            thread_id: Thread ID for conversation persistence
+            history: Prior turns to seed a newly created session with
+        """
+        from google.genai import types
+
         if not thread_id:
             thread_id = "default"
 
@@ -484,32 +1098,221 @@ When answering questions:
                             mode=types.FunctionCallingConfigMode.AUTO
                         )
                     )
-                )
+                ),
+                history=history
             )
             print(f"Created new chat session for thread: {thread_id}")
 
         return self.chat_sessions[thread_id]
 
+    async def _rewind_chat_session(self, thread_id: str, history_length: int):
+        """
+        Drop an unfinished turn from a thread's chat session
+        A turn interrupted between the function call and its response would leave the
+        history in a state Gemini rejects, so the session is rebuilt from the last
+        complete turn
+        """
+        thread_id = thread_id or "default"
+        chat_session = self.chat_sessions.pop(thread_id, None)
+        if chat_session is None:
+            return
+        history = list(chat_session.get_history(curated=True))[:history_length]
+        await self._get_or_create_chat_session(thread_id, history=history)
+
+    def cancel_turn(self, thread_id: str = None) -> bool:
+        """
+        Cancel the in-flight turn for a thread, including running tool and model calls
+        Wire this to Chainlit's @cl.on_stop / @cl.on_chat_end hooks
+
+        Returns:
+            True if a running turn was cancelled
+        """
+        task = self._active_turns.get(thread_id or "default")
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def add_listener(self, event: str, callback: Callable) -> Callable:
+        """
+        Subscribe to incremental turn events (for Chainlit or other front-ends)
+
+        Args:
+            event: One of EVENTS
+            callback: Called with a payload dict that always has "event" and "thread_id".
+                      Coroutine functions are scheduled without blocking the turn.
+
+        Returns:
+            A function that removes the listener
+        """
+        if event not in self._listeners:
+            raise ValueError(f"Unknown event: {event}. Expected one of {EVENTS}")
+        self._listeners[event].append(callback)
+        return lambda: self.remove_listener(event, callback)
+
+    def remove_listener(self, event: str, callback: Callable):
+        """Unsubscribe a callback added with add_listener"""
+        if callback in self._listeners.get(event, []):
+            self._listeners[event].remove(callback)
+
+    def _emit(self, event: str, thread_id: Optional[str], **payload):
+        """Publish an event to listeners; async listeners run in the background"""
+        import asyncio
+
+        payload = {"event": event, "thread_id": thread_id, **payload}
+        for callback in list(self._listeners[event]):
+            try:
+                result = callback(payload)
+                if asyncio.iscoroutine(result):
+                    # Keep a reference so the task isn't garbage collected mid-flight
+                    task = asyncio.ensure_future(self._run_listener(event, result))
+                    self._listener_tasks.add(task)
+                    task.add_done_callback(self._listener_tasks.discard)
+            except Exception as e:
+                print(f"Listener for {event} failed: {e}")
+
+    async def _run_listener(self, event: str, coro):
+        try:
+            await coro
+        except Exception as e:
+            print(f"Listener for {event} failed: {e}")
+
+    def _sources_from_result(self, function_name: str, result_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Extract source entries shown to the user from a tool result"""
+        if not result_data.get("success"):
+            return []
+
+        if function_name == "search_rfp_database":
+            return result_data.get("results") or []
+
+        if function_name == "get_rfp_statistics" and result_data.get("total_rfps"):
+            # For statistics, add a metadata entry to show total analyzed
+            return [{
+                "title": f"Statistical Analysis of {result_data['total_rfps']} RFPs",
+                "description": f"Analyzed by {result_data.get('facet_field', 'field')}",
+                "siteUrl": "",
+                "site": "Statistics",
+                "scrapedDate": "",
+                "closingDate": ""
+            }]
+
+        return []
+
+    def _format_sources_card(self, sources: List[Dict[str, Any]]) -> str:
+        """Compact markdown card listing sources (title, location, closing date, link)"""
+        lines = []
+        for source in sources:
+            title = source.get("title", "Untitled")
+            if source.get("siteUrl"):
+                title = f"[{title}]({source['siteUrl']})"
+            details = [d for d in (source.get("location"), source.get("closingDate") and f"closes {source['closingDate']}") if d]
+            lines.append(f"- {title}" + (f" ({', '.join(details)})" if details else ""))
+        return "\n".join(lines)
+
+    async def _push_sources(self, msg, sources: List[Dict[str, Any]]):
+        """Attach a sources card to the Chainlit message while the answer is still pending"""
+        import chainlit as cl
+
+        msg.elements = list(msg.elements or []) + [
+            cl.Text(name=f"Sources ({len(sources)})", content=self._format_sources_card(sources), display="inline")
+        ]
+        await msg.update()
+
+    async def _execute_function_call(self, fc) -> str:
+        """Run one Gemini function call and return its JSON string result"""
+        if fc.name == "search_rfp_database":
+            return await self._search_algolia_tool(
+                query=fc.args.get("query", ""),
+                filters=fc.args.get("filters", ""),
+                hits_per_page=fc.args.get("hits_per_page", 5),
+                date_range=fc.args.get("date_range", "")
+            )
+        elif fc.name == "get_rfp_statistics":
+            return await self._get_statistics_tool(
+                facet_by=fc.args.get("facet_by", "cnStatus"),
+                filters=fc.args.get("filters", ""),
+                date_range=fc.args.get("date_range", "")
+            )
+        return json.dumps({"success": False, "error": f"Unknown function: {fc.name}"})
+
     async def stream_response(self, user_query: str, thread_id: str = None) -> Dict[str, Any]:
         """
         Stream response using Gemini with function calling (Chainlit integration)
         This is the main method to use with Chainlit
 
+        The turn runs under a deadline (config["turn_timeout"]) split across the model,
+        tool and synthesis stages. A stage that runs out of time yields partial results
+        marked "timed_out" instead of holding the turn open. cancel_turn() (or Chainlit
+        cancelling the task on stop) cancels in-flight tool and model calls.
+
         Args:
             user_query: User's question
             thread_id: Thread ID for conversation persistence
         """
+        # Chainlit is only needed on the streaming (UI) path
+        import asyncio
+        import chainlit as cl
+        from google.genai import types
+
+        turn_key = thread_id or "default"
+        self._active_turns[turn_key] = asyncio.current_task()
+        deadline = _TurnDeadline(self.turn_timeout, self.stage_shares)
+        tool_tasks: List[asyncio.Task] = []
+        source_tasks: List[asyncio.Task] = []
+        history_length = None
+        msg = None
+
+        async def run_tool(fc):
+            # Publish each tool's sources as soon as it returns, without waiting
+            # for the other tools or the synthesis call
+            function_result = await self._execute_function_call(fc)
+            result_data = json.loads(function_result)
+            sources = self._sources_from_result(fc.name, result_data)
+            self._emit(
+                "sources", thread_id,
+                function=fc.name,
+                sources=sources,
+                total=result_data.get("total_matching_rfps", result_data.get("total_rfps", 0)),
+                timed_out=False
+            )
+            if self.early_sources and sources:
+                source_tasks.append(asyncio.ensure_future(self._push_sources(msg, sources)))
+            return function_result, result_data
+
         try:
             # Create message for streaming
             msg = cl.Message(content="")
             await msg.send()
+            self._emit("turn_started", thread_id, query=user_query)
 
             # Get or create chat session for this thread
             chat_session = await self._get_or_create_chat_session(thread_id)
+            history_length = len(chat_session.get_history(curated=True))
 
             # Send message to chat session
             print(f"Algolia Gemini Tool: Processing query for thread {thread_id}: {user_query}")
-            response = await chat_session.send_message(user_query)
+            try:
+                response = await asyncio.wait_for(
+                    chat_session.send_message(user_query),
+                    timeout=deadline.stage_timeout("model")
+                )
+            except asyncio.TimeoutError:
+                await self._rewind_chat_session(thread_id, history_length)
+                timeout_msg = "Sorry, the model took too long to respond (timed out). Please try again."
+                await msg.stream_token(timeout_msg)
+                await msg.update()
+                self._emit("answer", thread_id, text=timeout_msg, timed_out=True)
+                self._emit(
+                    "turn_completed", thread_id,
+                    success=False, timed_out=True, cancelled=False, function_calls=0, sources=[]
+                )
+                return {
+                    "success": False,
+                    "timed_out": True,
+                    "function_calls": 0,
+                    "sources": [],
+                    "message": msg
+                }
 
             # Check if Gemini wants to call the function
             function_calls = []
@@ -521,49 +1324,37 @@ When answering questions:
             # Execute function calls
             function_responses = []
             search_results = []
+            found_rfps = 0
+            timed_out = False
             if function_calls:
                 print(f"Gemini is calling {len(function_calls)} function(s)")
                 for fc in function_calls:
                     print(f"  Function: {fc.name}")
                     print(f"  Args: {fc.args}")
 
-                    # Execute the appropriate function
-                    if fc.name == "search_rfp_database":
-                        function_result = await self._search_algolia_tool(
-                            query=fc.args.get("query", ""),
-                            filters=fc.args.get("filters", ""),
-                            hits_per_page=fc.args.get("hits_per_page", 5),
-                            date_range=fc.args.get("date_range", "")
-                        )
+                # Run all calls concurrently within the tools stage budget
+                tools_timeout = deadline.stage_timeout("tools")
+                tool_tasks = [asyncio.ensure_future(run_tool(fc)) for fc in function_calls]
+                await asyncio.wait(tool_tasks, timeout=tools_timeout)
 
+                for fc, task in zip(function_calls, tool_tasks):
+                    if task.done():
+                        function_result, result_data = task.result()
                         # Parse results for source tracking
-                        import json
-                        result_data = json.loads(function_result)
-                        if result_data.get("success") and result_data.get("results"):
-                            search_results.extend(result_data["results"])
-
-                    elif fc.name == "get_rfp_statistics":
-                        function_result = await self._get_statistics_tool(
-                            facet_by=fc.args.get("facet_by", "cnStatus"),
-                            filters=fc.args.get("filters", ""),
-                            date_range=fc.args.get("date_range", "")
-                        )
-
-                        # For statistics, add a metadata entry to show total analyzed
-                        import json
-                        result_data = json.loads(function_result)
-                        if result_data.get("success") and result_data.get("total_rfps"):
-                            # Add a summary entry to sources
-                            search_results.append({
-                                "title": f"Statistical Analysis of {result_data['total_rfps']} RFPs",
-                                "description": f"Analyzed by {result_data.get('facet_field', 'field')}",
-                                "siteUrl": "",
-                                "site": "Statistics",
-                                "scrapedDate": "",
-                                "closingDate": ""
-                            })
+                        sources = self._sources_from_result(fc.name, result_data)
+                        search_results.extend(sources)
+                        if fc.name == "search_rfp_database":
+                            found_rfps += len(sources)
                     else:
-                        function_result = json.dumps({"success": False, "error": f"Unknown function: {fc.name}"})
+                        task.cancel()
+                        timed_out = True
+                        print(f"  Function {fc.name} timed out after {tools_timeout:.1f}s")
+                        function_result = json.dumps({
+                            "success": False,
+                            "timed_out": True,
+                            "error": f"Timed out after {tools_timeout:.1f} seconds"
+                        })
+                        self._emit("sources", thread_id, function=fc.name, sources=[], total=0, timed_out=True)
 
                     # Create function response
                     function_responses.append(
@@ -575,43 +1366,98 @@ When answering questions:
                         )
                     )
 
-                # Send function results back to chat session
-                final_response = await chat_session.send_message(function_responses)
+                # Send function results back to chat session with whatever budget is left
+                try:
+                    final_response = await asyncio.wait_for(
+                        chat_session.send_message(function_responses),
+                        timeout=deadline.stage_timeout("synthesis")
+                    )
+                except asyncio.TimeoutError:
+                    final_response = None
+                    timed_out = True
+                    await self._rewind_chat_session(thread_id, history_length)
 
                 # Stream the response text
-                if final_response.text:
-                    await msg.stream_token(final_response.text)
+                if final_response is not None:
+                    answer = final_response.text or ""
+                else:
+                    answer = (
+                        f"The answer timed out before it was complete. "
+                        f"Found {found_rfps} matching result(s), listed in the sources."
+                    )
             else:
                 # No function call needed - stream direct response
-                await msg.stream_token(response.text)
+                answer = response.text or ""
+
+            if answer:
+                await msg.stream_token(answer)
+            self._emit("answer", thread_id, text=answer, timed_out=timed_out)
 
+            # Let early source updates land before the final message update
+            if source_tasks:
+                await asyncio.wait(source_tasks, timeout=deadline.remaining())
             await msg.update()
 
+            self._emit(
+                "turn_completed", thread_id,
+                success=True,
+                timed_out=timed_out,
+                cancelled=False,
+                function_calls=len(function_calls),
+                sources=search_results
+            )
+
             return {
                 "success": True,
+                "timed_out": timed_out,
                 "function_calls": len(function_calls),
                 "sources": search_results,
                 "message": msg
             }
 
+        except asyncio.CancelledError:
+            # Session stopped or disconnected: stop the work, keep the history valid
+            print(f"Algolia Gemini Tool: Turn cancelled for thread {thread_id}")
+            for task in tool_tasks + source_tasks:
+                task.cancel()
+            if history_length is not None:
+                await self._rewind_chat_session(thread_id, history_length)
+            # Listeners (e.g. other front-ends) still need to learn that the turn ended
+            self._emit(
+                "turn_completed", thread_id,
+                success=False, timed_out=False, cancelled=True, function_calls=len(tool_tasks), sources=[]
+            )
+            raise
+
         except Exception as e:
             error_msg = f"Error generating response: {str(e)}"
             print(error_msg)
             import traceback
             traceback.print_exc()
-            await msg.stream_token(error_msg)
-            await msg.update()
+            if msg is not None:
+                await msg.stream_token(error_msg)
+                await msg.update()
+            self._emit(
+                "turn_completed", thread_id,
+                success=False, timed_out=False, cancelled=False, function_calls=0, sources=[]
+            )
             return {
                 "success": False,
                 "error": str(e),
                 "sources": []
             }
 
+        finally:
+            if self._active_turns.get(turn_key) is asyncio.current_task():
+                del self._active_turns[turn_key]
+
     async def generate_response_with_tools(self, user_query: str) -> Dict[str, Any]:
         """
         Generate response using Gemini with function calling
         Gemini will automatically decide when and how to call the search tool
         """
+        from google.genai import types
+
         try:
             # Create the search tool
             search_tool = await self._create_search_tool_declaration()
@@ -652,42 +1498,16 @@ When answering questions:
 
             # Execute function calls
             function_responses = []
+            search_results = []
             if function_calls:
                 print(f"\nGemini is calling {len(function_calls)} function(s)")
                 for fc in function_calls:
                     print(f"  Function: {fc.name}")
                     print(f"  Args: {fc.args}")
 
-                    # Execute the appropriate function
-                    if fc.name == "search_rfp_database":
-                        function_result = await self._search_algolia_tool(
-                            query=fc.args.get("query", ""),
-                            filters=fc.args.get("filters", ""),
-                            hits_per_page=fc.args.get("hits_per_page", 5),
-                            date_range=fc.args.get("date_range", "")
-                        )
-                    elif fc.name == "get_rfp_statistics":
-                        function_result = await self._get_statistics_tool(
-                            facet_by=fc.args.get("facet_by", "cnStatus"),
-                            filters=fc.args.get("filters", ""),
-                            date_range=fc.args.get("date_range", "")
-                        )
-
-                        # For statistics, add a metadata entry to show total analyzed
-                        import json
-                        result_data = json.loads(function_result)
-                        if result_data.get("success") and result_data.get("total_rfps"):
-                            # Add a summary entry to sources
-                            search_results.append({
-                                "title": f"Statistical Analysis of {result_data['total_rfps']} RFPs",
-                                "description": f"Analyzed by {result_data.get('facet_field', 'field')}",
-                                "siteUrl": "",
-                                "site": "Statistics",
-                                "scrapedDate": "",
-                                "closingDate": ""
-                            })
-                    else:
-                        function_result = json.dumps({"success": False, "error": f"Unknown function: {fc.name}"})
+                    # Execute the appropriate function and track its sources
+                    function_result = await self._execute_function_call(fc)
+                    search_results.extend(self._sources_from_result(fc.name, json.loads(function_result)))
 
                     # Create function response
                     function_responses.append(
@@ -718,6 +1538,7 @@ When answering questions:
             return {
                 "answer": answer,
                 "function_calls": len(function_calls),
+                "sources": search_results,
                 "success": True
             }
 
@@ -732,11 +1553,32 @@ When answering questions:
             }
 
     async def close(self):
-        """Close clients"""
-        try:
-            await self.algolia_client.close()
-        except:
-            pass
+        """
+        Release this tool's clients
+        Shared clients stay pooled for other tools (see shutdown_clients());
+        private clients (share_clients=False) are closed here
+        """
+        algolia_clients = [self._algolia_client, self._algolia_hedge_client]
+        gemini_client = self._gemini_client
+        self._algolia_client = None
+        self._algolia_hedge_client = None
+        self._gemini_client = None
+
+        if self.share_clients:
+            return
+
+        for algolia_client in algolia_clients:
+            if algolia_client is None:
+                continue
+            try:
+                await algolia_client.close()
+            except Exception as e:
+                print(f"Failed to close Algolia client: {e}")
+        if gemini_client is not None:
+            try:
+                await _close_gemini_client(gemini_client)
+            except Exception as e:
+                print(f"Failed to close Gemini client: {e}")
 
 
 # Test function
@@ -746,6 +1588,7 @@ if __name__ == "__main__":
     async def test():
         tool = None
         try:
+            load_env()
             tool = AlgoliaGeminiTool()
 
             # Test with the user's original question
@@ -772,5 +1615,6 @@ if __name__ == "__main__":
         finally:
             if tool:
                 await tool.close()
+            await shutdown_clients()
 
     asyncio.run(test())
@@ -0,0 +1,231 @@
+"""
+Benchmarks for algolia_gemini_tool
+Measures import time and tool construction time against enforceable budgets,
+and times _search_algolia_tool decoding on the model path, the raw-JSON fast
+path, and the fast path with local duplicate collapsing
+
+Usage:
+    python bench_algolia_gemini_tool.py [--import-budget-ms 50] [--startup-budget-ms 5] [--hits 50]
+
+Exits with status 1 when a budget is exceeded, so it can gate CI
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import types
+import random
+import asyncio
+import statistics
+import subprocess
+import contextlib
+import importlib.util
+from typing import List, Dict, Any, Optional
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that must not be pulled in by a plain import of the tool module
+HEAVY_MODULES = ["chainlit", "google.genai", "algoliasearch", "dotenv", "asyncio"]
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import algolia_gemini_tool
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+DUMMY_CONFIG = {
+    "algolia_app_id": "BENCHAPP",
+    "algolia_search_api_key": "bench-key",
+    "gemini_api_key": "bench-key"
+}
+
+
+def bench_import(runs: int) -> Dict[str, Any]:
+    """Time `import algolia_gemini_tool` in fresh interpreters"""
+    timings: List[float] = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE],
+            cwd=TOOLS_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        loaded = result["loaded"]
+
+    return {"median_ms": statistics.median(timings), "heavy_modules_loaded": loaded}
+
+
+def bench_startup(runs: int) -> Dict[str, Any]:
+    """Time AlgoliaGeminiTool() construction (no network clients are built)"""
+    sys.path.insert(0, TOOLS_DIR)
+    from algolia_gemini_tool import AlgoliaGeminiTool
+
+    timings: List[float] = []
+    devnull = open(os.devnull, "w")
+    stdout = sys.stdout
+    try:
+        sys.stdout = devnull
+        for _ in range(runs):
+            start = time.perf_counter()
+            AlgoliaGeminiTool(DUMMY_CONFIG)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    return {"median_ms": statistics.median(timings)}
+
+
+def _sample_response(hits: int) -> str:
+    """
+    Raw Algolia search response body with realistic solicitation hits
+    Every third hit is the previous solicitation scraped from another site
+    """
+    rng = random.Random(42)
+    now = 1760000000000
+    day = 86400000
+    sample_hits = []
+    for i in range(hits):
+        if i % 3 == 2:
+            duplicate = dict(sample_hits[-1], objectID=f"sol-{i}", site="govspend",
+                             siteUrl=f"https://example.com/mirror/{i}")
+            sample_hits.append(duplicate)
+            continue
+        sample_hits.append({
+            "objectID": f"sol-{i}",
+            "title": f"RFP 25-{i:03d} Managed IT Services",
+            "description": "Provide managed services, help desk and cloud migration support. " * 4,
+            "issuer": f"County {i % 7}",
+            "location": rng.choice(["California", "Texas", "Florida", "New York"]),
+            "site": rng.choice(["bidsync", "demandstar", "bonfirehub"]),
+            "siteUrl": f"https://example.com/rfp/{i}",
+            "created": now - rng.randint(0, 90) * day,
+            "closingDate": now + rng.randint(0, 60) * day,
+            "publishDate": now - rng.randint(0, 120) * day,
+            "questionsDueByDate": now + rng.randint(0, 30) * day if i % 3 else None,
+            "cnStatus": "new",
+            "cnType": "rfp",
+            "categories": ["IT Services", "Consulting"],
+            "keywords": ["managed services", "cloud"],
+            "_highlightResult": {"title": {"value": f"RFP 25-{i:03d}", "matchLevel": "none", "matchedWords": []}}
+        })
+    return json.dumps({
+        "hits": sample_hits,
+        "nbHits": 1234,
+        "page": 0,
+        "nbPages": 25,
+        "hitsPerPage": hits,
+        "processingTimeMS": 3,
+        "exhaustiveNbHits": True,
+        "query": "managed services",
+        "params": "query=managed+services"
+    })
+
+
+class _ReplayClient:
+    """SearchClient stand-in replaying one response body, decoded as SearchClient would"""
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    async def search_single_index_with_http_info(self, index_name, search_params):
+        return types.SimpleNamespace(raw_data=self.raw)
+
+    async def search_single_index(self, index_name, search_params):
+        from algoliasearch.http.api_response import ApiResponse
+        from algoliasearch.search.models import SearchResponse
+        return ApiResponse.deserialize(SearchResponse, self.raw)
+
+
+def bench_hit_formatting(runs: int, hits: int) -> Optional[Dict[str, Any]]:
+    """Time _search_algolia_tool on one replayed response for each decoding path"""
+    sys.path.insert(0, TOOLS_DIR)
+    import algolia_gemini_tool as module
+
+    if importlib.util.find_spec("algoliasearch") is None:
+        return None
+
+    raw = _sample_response(hits)
+    paths = {
+        # name: (tool config, hits_per_page) - collapsing over-fetches, so it
+        # asks for a third of the page to consume the whole response
+        "model": ({"raw_json": False, "dedupe_results": False}, hits),
+        "fast": ({"raw_json": True, "dedupe_results": False}, hits),
+        "fast+collapse": ({"raw_json": True, "dedupe_results": True}, max(1, hits // module.DEDUPE_OVERFETCH_FACTOR))
+    }
+
+    async def run_paths():
+        payloads = {}
+        timings = {}
+        for name, (config, hits_per_page) in paths.items():
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                tool = module.AlgoliaGeminiTool({**DUMMY_CONFIG, **config})
+            tool._clients_loop = asyncio.get_running_loop()
+            tool._algolia_client = _ReplayClient(raw)
+
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                payload = await tool._search_algolia_tool("managed services", hits_per_page=hits_per_page)
+                samples.append((time.perf_counter() - start) * 1000)
+            payloads[name] = json.loads(payload)
+            timings[name] = statistics.median(samples)
+        return payloads, timings
+
+    payloads, timings = asyncio.run(run_paths())
+
+    # Both decoding paths must produce the same payload
+    if not payloads["fast"]["success"] or payloads["fast"] != payloads["model"]:
+        raise AssertionError("fast path output differs from the model path")
+    timings["collapsed"] = payloads["fast+collapse"]["duplicates_collapsed"]
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--import-budget-ms", type=float, default=50.0)
+    parser.add_argument("--startup-budget-ms", type=float, default=5.0)
+    parser.add_argument("--hits", type=int, default=50, help="Hits per response for the formatting benchmark")
+    args = parser.parse_args()
+
+    failures = []
+
+    import_result = bench_import(args.runs)
+    print(f"import:  median {import_result['median_ms']:.2f} ms (budget {args.import_budget_ms} ms)")
+    if import_result["median_ms"] > args.import_budget_ms:
+        failures.append("import time over budget")
+    if import_result["heavy_modules_loaded"]:
+        failures.append(f"heavy modules imported eagerly: {import_result['heavy_modules_loaded']}")
+
+    startup_result = bench_startup(args.runs)
+    print(f"startup: median {startup_result['median_ms']:.3f} ms (budget {args.startup_budget_ms} ms)")
+    if startup_result["median_ms"] > args.startup_budget_ms:
+        failures.append("startup time over budget")
+
+    format_result = bench_hit_formatting(max(args.runs, 50), args.hits)
+    if format_result is None:
+        print("format:  skipped (algoliasearch not installed)")
+    else:
+        print(
+            f"format:  {args.hits} hits - model path {format_result['model']:.3f} ms, "
+            f"fast path {format_result['fast']:.3f} ms ({format_result['model'] / format_result['fast']:.1f}x), "
+            f"fast path + collapsing {format_result['fast+collapse']:.3f} ms "
+            f"({format_result['collapsed']} duplicates collapsed)"
+        )
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
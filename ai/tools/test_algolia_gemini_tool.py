@@ -0,0 +1,513 @@
+"""
+Tests for algolia_gemini_tool
+Network clients are replaced by local servers or fakes; no credentials needed
+"""
+import gc
+import os
+import sys
+import json
+import types
+import asyncio
+import warnings
+import threading
+import subprocess
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import algolia_gemini_tool as module
+from algolia_gemini_tool import AlgoliaGeminiTool
+
+CONFIG = {
+    "algolia_app_id": "TESTAPP",
+    "algolia_search_api_key": "test-key",
+    "gemini_api_key": "test-key"
+}
+
+
+class _AlgoliaHandler(BaseHTTPRequestHandler):
+    """Answers every search with one hit"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        body = json.dumps({
+            "hits": [{"title": "Managed IT Services", "issuer": "City of Dallas", "siteUrl": "https://a"}],
+            "nbHits": 1
+        }).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def algolia_server(monkeypatch):
+    """Local Algolia stand-in; clients built by the tool are pointed at it"""
+    pytest.importorskip("algoliasearch")
+    from algoliasearch.http.hosts import Host, HostsCollection
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _AlgoliaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    create_algolia_client = module._create_algolia_client
+
+    def create_local_client(*args, **kwargs):
+        client = create_algolia_client(*args, **kwargs)
+        client._config.hosts = HostsCollection([Host("127.0.0.1", scheme="http", port=server.server_port)])
+        return client
+
+    monkeypatch.setattr(module, "_create_algolia_client", create_local_client)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(module, "_client_registry", module._ClientRegistry())
+
+
+class FakeMessage:
+    """Stand-in for chainlit.Message that records what the user would see"""
+
+    def __init__(self, content=""):
+        self.content = content
+        self.elements = []
+        self.updates = []
+
+    async def send(self):
+        pass
+
+    async def stream_token(self, token):
+        self.content += token
+
+    async def update(self):
+        self.updates.append((self.content, [element.name for element in self.elements]))
+
+
+class FakeText:
+    def __init__(self, name, content, display):
+        self.name = name
+        self.content = content
+        self.display = display
+
+
+@pytest.fixture
+def fake_chainlit(monkeypatch):
+    chainlit = types.ModuleType("chainlit")
+    chainlit.Message = FakeMessage
+    chainlit.Text = FakeText
+    monkeypatch.setitem(sys.modules, "chainlit", chainlit)
+    return chainlit
+
+
+class FakeChat:
+    """
+    Stand-in for a Gemini chat session
+    The first message is answered with the given function calls, the function
+    responses with an answer after synthesis_delay seconds
+    """
+
+    def __init__(self, function_calls, synthesis_delay=0.0, history=None, on_synthesis=None):
+        self.function_calls = function_calls
+        self.synthesis_delay = synthesis_delay
+        self.history = list(history or [])
+        self.function_responses = None
+        self.on_synthesis = on_synthesis
+
+    def get_history(self, curated=False):
+        return self.history
+
+    async def send_message(self, message):
+        from google.genai import types as genai_types
+
+        if isinstance(message, str):
+            parts = [genai_types.Part(function_call=genai_types.FunctionCall(name=name, args=args))
+                     for name, args in self.function_calls]
+            self.history += ["user", "model:function_call"]
+        else:
+            self.function_responses = message
+            if self.on_synthesis:
+                self.on_synthesis()
+            await asyncio.sleep(self.synthesis_delay)
+            parts = [genai_types.Part(text="Here are the RFPs.")]
+            self.history += ["user:function_response", "model"]
+
+        return genai_types.GenerateContentResponse(candidates=[
+            genai_types.Candidate(content=genai_types.Content(role="model", parts=parts))
+        ])
+
+
+class FakeAlgolia:
+    """Stand-in for SearchClient answering raw searches after a delay"""
+
+    def __init__(self, delay=0.0, hits=None):
+        self.delay = delay
+        self.hits = hits if hits is not None else [
+            {"title": "Managed IT Services", "issuer": "City of Dallas", "site": "bidsync", "siteUrl": "https://a"}
+        ]
+        self.calls = 0
+        self.cancelled = 0
+
+    async def search_single_index_with_http_info(self, index_name, search_params):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        hits = self.hits[:search_params["hitsPerPage"]]
+        return types.SimpleNamespace(raw_data=json.dumps({"hits": hits, "nbHits": len(self.hits)}))
+
+    async def search_single_index(self, index_name, search_params):
+        # Only used by the statistics tool
+        return types.SimpleNamespace(nb_hits=40, facets={"cnStatus": {"new": 30, "pursuing": 10}})
+
+
+def make_tool(algolia=None, chat=None, thread_id="thread", **config):
+    """Tool wired to fakes, bypassing schema discovery and client creation"""
+    pytest.importorskip("google.genai")
+
+    tool = AlgoliaGeminiTool({**CONFIG, **config})
+    tool.schema_info = {"date_fields": ["created"], "sample_keys": ["title"]}
+    tool._clients_loop = module._running_loop()
+    tool._algolia_client = algolia or FakeAlgolia()
+    tool._gemini_client = types.SimpleNamespace(aio=types.SimpleNamespace(chats=types.SimpleNamespace(
+        create=lambda model, config, history=None: FakeChat([], history=history)
+    )))
+    if chat is not None:
+        tool.chat_sessions[thread_id] = chat
+    return tool
+
+
+def function_result(chat, index=0):
+    return json.loads(chat.function_responses[index].function_response.response["result"])
+
+
+def assert_no_resource_warnings(recorded):
+    gc.collect()
+    leaks = [str(warning.message) for warning in recorded if issubclass(warning.category, ResourceWarning)]
+    assert not leaks
+
+
+def test_shared_clients_work_across_event_loops(algolia_server):
+    tool = AlgoliaGeminiTool(CONFIG)
+
+    async def search():
+        try:
+            return json.loads(await tool._search_algolia_tool("managed services"))
+        finally:
+            await module.shutdown_clients()
+
+    # Batch jobs run each unit of work in its own asyncio.run()
+    with warnings.catch_warnings(record=True) as recorded:
+        warnings.simplefilter("always")
+        for _ in range(2):
+            result = asyncio.run(search())
+            assert result["success"], result
+            assert result["returned_results"] == 1
+        assert_no_resource_warnings(recorded)
+
+
+def test_pool_options_are_part_of_the_registry_key():
+    async def clients():
+        try:
+            default = AlgoliaGeminiTool(CONFIG)
+            same = AlgoliaGeminiTool(CONFIG)
+            tuned = AlgoliaGeminiTool({**CONFIG, "pool_options": {"max_connections": 99}})
+            return default.algolia_client, same.algolia_client, tuned.algolia_client
+        finally:
+            await module.shutdown_clients()
+
+    with warnings.catch_warnings(record=True) as recorded:
+        warnings.simplefilter("always")
+        default, same, tuned = asyncio.run(clients())
+        assert default is same
+        assert tuned is not default
+        del default, same, tuned
+        assert_no_resource_warnings(recorded)
+
+
+def test_tool_timeout_returns_partial_results(fake_chainlit):
+    async def run():
+        algolia = FakeAlgolia(delay=10)
+        chat = FakeChat([("search_rfp_database", {"query": "managed services"})])
+        tool = make_tool(algolia, chat, turn_timeout=0.5)
+        result = await tool.stream_response("managed services", "thread")
+        return result, chat, algolia
+
+    result, chat, algolia = asyncio.run(run())
+
+    assert result["success"] and result["timed_out"]
+    assert result["message"].content == "Here are the RFPs."
+    # Gemini is told the search timed out instead of the turn hanging
+    assert function_result(chat)["success"] is False
+    assert function_result(chat)["timed_out"] is True
+    assert algolia.cancelled == 1
+
+
+def test_synthesis_timeout_keeps_sources_and_rewinds_history(fake_chainlit):
+    async def run():
+        chat = FakeChat([("search_rfp_database", {"query": "managed services"})],
+                        synthesis_delay=10, history=["previous user", "previous model"])
+        tool = make_tool(chat=chat, turn_timeout=0.5)
+        result = await tool.stream_response("managed services", "thread")
+        return result, tool
+
+    result, tool = asyncio.run(run())
+
+    assert result["success"] and result["timed_out"]
+    assert "timed out" in result["message"].content
+    assert [source["siteUrl"] for source in result["sources"]] == ["https://a"]
+    # The unanswered function call is dropped so the next turn is valid
+    assert tool.chat_sessions["thread"].get_history() == ["previous user", "previous model"]
+
+
+def test_cancel_turn_cancels_tool_calls(fake_chainlit):
+    async def run():
+        algolia = FakeAlgolia(delay=10)
+        chat = FakeChat([("search_rfp_database", {"query": "managed services"})])
+        tool = make_tool(algolia, chat)
+        events = []
+        for event in module.EVENTS:
+            tool.add_listener(event, events.append)
+        turn = asyncio.ensure_future(tool.stream_response("managed services", "thread"))
+        while not algolia.calls:
+            await asyncio.sleep(0.01)
+
+        assert tool.cancel_turn("thread")
+        with pytest.raises(asyncio.CancelledError):
+            await turn
+        await asyncio.sleep(0)
+        return tool, algolia, events
+
+    tool, algolia, events = asyncio.run(run())
+
+    # Subscribers get a terminal event even though the turn never returns
+    assert [event["event"] for event in events] == ["turn_started", "turn_completed"]
+    assert events[-1]["cancelled"] is True
+    assert events[-1]["success"] is False
+    assert algolia.cancelled == 1
+    assert tool._active_turns == {}
+    assert tool.chat_sessions["thread"].get_history() == []
+    assert not tool.cancel_turn("thread")
+
+
+def test_hedged_search_returns_first_answer(fake_chainlit):
+    async def run():
+        primary = FakeAlgolia(delay=10)
+        hedge = FakeAlgolia(delay=0, hits=[{"title": "From fallback host", "siteUrl": "https://b"}])
+        tool = make_tool(primary, hedge_requests=True, hedge_delay=0.05)
+        tool._algolia_hedge_client = hedge
+        result = json.loads(await tool._search_algolia_tool("managed services"))
+        await asyncio.sleep(0)
+        return result, primary, hedge
+
+    result, primary, hedge = asyncio.run(run())
+
+    assert [hit["title"] for hit in result["results"]] == ["From fallback host"]
+    assert hedge.calls == 1
+    assert primary.cancelled == 1
+
+
+def test_synthesis_timeout_counts_only_matching_rfps(fake_chainlit):
+    async def run():
+        chat = FakeChat([
+            ("search_rfp_database", {"query": "managed services"}),
+            ("get_rfp_statistics", {"facet_by": "cnStatus"})
+        ], synthesis_delay=10)
+        tool = make_tool(chat=chat, turn_timeout=0.5)
+        return await tool.stream_response("managed services", "thread")
+
+    result = asyncio.run(run())
+
+    assert len(result["sources"]) == 2
+    assert "Found 1 matching result(s)" in result["message"].content
+
+
+def test_events_are_published_during_the_turn(fake_chainlit):
+    events = []
+
+    async def run():
+        chat = FakeChat([("search_rfp_database", {"query": "managed services"})],
+                        on_synthesis=lambda: events.append("synthesis_started"))
+        tool = make_tool(chat=chat, early_sources=True)
+
+        async def on_sources(payload):
+            events.append(("sources", [source["siteUrl"] for source in payload["sources"]]))
+
+        tool.add_listener("turn_started", lambda payload: events.append(("turn_started", payload["query"])))
+        tool.add_listener("sources", on_sources)
+        tool.add_listener("answer", lambda payload: events.append(("answer", payload["text"])))
+        remove = tool.add_listener("turn_completed", lambda payload: events.append("turn_completed"))
+
+        result = await tool.stream_response("managed services", "thread")
+        await asyncio.sleep(0)
+
+        remove()
+        await tool.stream_response("again", "thread")
+        return result
+
+    result = asyncio.run(run())
+
+    assert events[:5] == [
+        ("turn_started", "managed services"),
+        ("sources", ["https://a"]),
+        "synthesis_started",
+        ("answer", "Here are the RFPs."),
+        "turn_completed"
+    ]
+    assert "turn_completed" not in events[5:]
+    # The sources card was on the message before the answer text arrived
+    assert result["message"].updates[0] == ("", ["Sources (1)"])
+
+
+def test_listener_errors_do_not_break_the_turn(fake_chainlit):
+    async def run():
+        chat = FakeChat([("search_rfp_database", {"query": "managed services"})])
+        tool = make_tool(chat=chat)
+        tool.add_listener("sources", lambda payload: 1 / 0)
+        return await tool.stream_response("managed services", "thread")
+
+    assert asyncio.run(run())["success"]
+
+    with pytest.raises(ValueError):
+        make_tool().add_listener("unknown", print)
+
+
+def test_generate_response_with_tools_collects_statistics_sources():
+    from google.genai import types as genai_types
+
+    def response(*parts):
+        return genai_types.GenerateContentResponse(candidates=[
+            genai_types.Candidate(content=genai_types.Content(role="model", parts=list(parts)))
+        ])
+
+    replies = [
+        response(genai_types.Part(function_call=genai_types.FunctionCall(
+            name="get_rfp_statistics", args={"facet_by": "cnStatus"}
+        ))),
+        response(genai_types.Part(text="75% are new."))
+    ]
+
+    async def generate_content(model, contents, config):
+        return replies.pop(0)
+
+    async def run():
+        tool = make_tool()
+        tool._gemini_client = types.SimpleNamespace(aio=types.SimpleNamespace(
+            models=types.SimpleNamespace(generate_content=generate_content)
+        ))
+        return await tool.generate_response_with_tools("How many RFPs are new?")
+
+    result = asyncio.run(run())
+
+    assert result["success"], result
+    assert result["answer"] == "75% are new."
+    assert [source["title"] for source in result["sources"]] == ["Statistical Analysis of 40 RFPs"]
+
+
+def test_malformed_timestamps_do_not_break_the_page():
+    hits = [
+        {"title": "Managed IT Services", "siteUrl": "https://a", "created": [1760000000000],
+         "closingDate": {"ms": 1760000000000}, "publishDate": "2025-10-09"},
+        {"title": "Cloud Migration", "siteUrl": "https://b", "created": 1760000000000}
+    ]
+
+    async def search():
+        tool = make_tool(FakeAlgolia(hits=hits), dedupe_results=False)
+        return json.loads(await tool._search_algolia_tool("managed services"))
+
+    result = asyncio.run(search())
+
+    assert result["success"], result
+    malformed, valid = result["results"]
+    assert malformed["scrapedDate"] is malformed["closingDate"] is malformed["publishDate"] is None
+    assert valid["scrapedDate"] == date.fromtimestamp(1760000000).isoformat()
+
+
+def rfp(title, site="bidsync", issuer="City of Springfield", closing_date="2025-11-14"):
+    return {"title": title, "issuer": issuer, "closingDate": closing_date,
+            "site": site, "siteUrl": f"https://{site}.example.com/{len(title)}"}
+
+
+@pytest.mark.parametrize("first, second", [
+    ("RFP 25-001 Road Resurfacing", "RFP 25-002 Road Resurfacing"),
+    ("Janitorial Services Building A", "Janitorial Services Building B"),
+])
+def test_similar_but_distinct_rfps_are_not_collapsed(first, second):
+    results = [rfp(first), rfp(second, site="govspend")]
+    unique, collapsed = make_tool()._collapse_duplicates(results, results, 10)
+
+    assert collapsed == 0
+    assert [result["title"] for result in unique] == [first, second]
+
+
+@pytest.mark.parametrize("issuer, closing_date", [("", None), ("City of Springfield", "2025-11-14")])
+def test_untitled_rfps_are_not_collapsed(issuer, closing_date):
+    hits = [
+        {"issuer": issuer, "closingDate": closing_date, "site": "bidsync", "siteUrl": "https://a"},
+        {"issuer": issuer, "closingDate": closing_date, "site": "govspend", "siteUrl": "https://b"}
+    ]
+    tool = make_tool()
+    # Formatting fills in the "Untitled" placeholder; it must not be matched as a title
+    results = tool._format_hits(hits)
+
+    unique, collapsed = tool._collapse_duplicates(results, hits, 10)
+
+    assert collapsed == 0
+    assert [result["siteUrl"] for result in unique] == ["https://a", "https://b"]
+
+
+@pytest.mark.parametrize("issuer, closing_date", [("", "2025-11-14"), ("City of Springfield", None)])
+def test_rfps_missing_issuer_or_closing_date_are_not_collapsed(issuer, closing_date):
+    results = [
+        rfp("Road Resurfacing Services", issuer=issuer, closing_date=closing_date),
+        rfp("Road Resurfacing Services", site="govspend", issuer=issuer, closing_date=closing_date)
+    ]
+
+    unique, collapsed = make_tool()._collapse_duplicates(results, results, 10)
+
+    assert collapsed == 0
+    assert len(unique) == 2
+
+
+def test_duplicate_rfps_are_collapsed():
+    results = [
+        rfp("RFP 25-001: Road Resurfacing Services"),
+        rfp("Road Resurfacing Services - RFP 25-001", site="govspend", issuer="City of Springfield."),
+        rfp("RFP 25-001: Road Resurfacing Services", site="demandstar", closing_date="2025-12-01"),
+    ]
+
+    unique, collapsed = make_tool()._collapse_duplicates(results, results, 10)
+
+    assert collapsed == 1
+    assert len(unique) == 2
+    assert unique[0]["alternateSources"] == [{"site": "govspend", "siteUrl": results[1]["siteUrl"]}]
+
+
+def test_simhash_is_stable_across_processes():
+    probe = "import algolia_gemini_tool as m; print(m._simhash(['road', 'resurfacing', '25', '001']))"
+    fingerprints = {
+        subprocess.run([sys.executable, "-c", probe], cwd=os.path.dirname(module.__file__),
+                       env={**os.environ, "PYTHONHASHSEED": seed},
+                       capture_output=True, text=True, check=True).stdout.strip()
+        for seed in ("1", "2")
+    }
+
+    assert fingerprints == {str(module._simhash(["road", "resurfacing", "25", "001"]))}
+
+
+def test_alternate_sources_are_described_only_for_local_collapsing():
+    async def description(**config):
+        declaration = await make_tool(**config)._create_search_tool_declaration()
+        return declaration.function_declarations[0].description
+
+    assert "alternateSources" in asyncio.run(description())
+    assert "alternateSources" not in asyncio.run(description(algolia_distinct=True))
+    assert "alternateSources" not in asyncio.run(description(dedupe_results=False))